@@ -0,0 +1,97 @@
+"""Performance patches for FastAPI internals.
+
+FastAPI (as of 0.104) re-runs `inspect` based checks against every dependency
+callable on every request while solving the dependency tree. The results never
+change for a given callable, so they are memoized here, keyed weakly on the callable
+so that dependencies created at runtime can still be garbage collected.
+
+Older versions also fully re-solve the sub-dependencies of a dependency which is
+already in the per-request cache, only checking the cache afterwards. FastAPI 0.111
+(tiangolo/fastapi#11323) checks the cache first; the same short-circuit is backported
+here for older versions.
+"""
+
+import functools
+import weakref
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+import fastapi
+from fastapi.dependencies import utils
+
+R = TypeVar("R")
+
+_PATCHED = False
+
+
+def _memoize(func: Callable[[Any], R]) -> Callable[[Any], R]:
+    cache: weakref.WeakKeyDictionary[Any, R] = weakref.WeakKeyDictionary()
+
+    @functools.wraps(func)
+    def wrapper(call: Any) -> R:
+        try:
+            return cache[call]
+        except KeyError:
+            result = cache[call] = func(call)
+            return result
+        except TypeError:
+            # Callable is not hashable or cannot be weak referenced, skip the cache
+            return func(call)
+
+    return wrapper
+
+
+def _skip_cached(func):
+    @functools.wraps(func)
+    async def solve_dependencies(
+        *, dependant, dependency_cache=None, background_tasks=None, **kwargs
+    ):
+        if (
+            dependency_cache
+            and dependant.use_cache
+            and dependant.cache_key in dependency_cache
+        ):
+            # Caller reads the solved value from `dependency_cache`, skip resolving
+            # the sub-dependencies of the dependant again
+            return {}, [], background_tasks, None, {}
+
+        return await func(
+            dependant=dependant,
+            dependency_cache=dependency_cache,
+            background_tasks=background_tasks,
+            **kwargs,
+        )
+
+    return solve_dependencies
+
+
+def _version() -> tuple[int, ...]:
+    return tuple(int(part) for part in fastapi.__version__.split(".")[:2])
+
+
+def configure() -> None:
+    """Patch `fastapi.dependencies.utils` with memoized inspection helpers, and
+    backport the cached sub-dependency short-circuit on FastAPI < 0.111.
+
+    Should be called before any routers are imported, as the typed signatures of
+    routes are resolved when their decorators run.
+    """
+    global _PATCHED
+
+    if _PATCHED:
+        return
+
+    for name in (
+        "get_typed_signature",
+        "is_async_gen_callable",
+        "is_coroutine_callable",
+        "is_gen_callable",
+    ):
+        setattr(utils, name, _memoize(getattr(utils, name)))
+
+    # Only the recursive calls within `utils` are patched, the top level call from
+    # `fastapi.routing` keeps its reference to the original function
+    if _version() < (0, 111):
+        utils.solve_dependencies = _skip_cached(utils.solve_dependencies)
+
+    _PATCHED = True
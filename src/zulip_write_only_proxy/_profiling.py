@@ -0,0 +1,31 @@
+from typing import TYPE_CHECKING
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import HTMLResponse
+
+if TYPE_CHECKING:  # pragma: no cover
+    from starlette.requests import Request
+    from starlette.responses import Response
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """Profile a request with PyInstrument when it has a `profile` query parameter,
+    returning the HTML report instead of the response.
+
+    Only added when `ZWOP_PROFILE` is set, requires `pyinstrument` to be installed.
+    """
+
+    async def dispatch(self, request: "Request", call_next) -> "Response":
+        if not request.query_params.get("profile"):
+            return await call_next(request)
+
+        from pyinstrument import Profiler  # type: ignore[import-not-found]
+
+        # A new profiler per request, as profilers are not safe to share
+        profiler = Profiler(interval=0.001, async_mode="enabled")
+
+        profiler.start()
+        await call_next(request)
+        profiler.stop()
+
+        return HTMLResponse(profiler.output_html())
@@ -1,10 +1,27 @@
+"""Application factory and entrypoint.
+
+Concurrency is configured via settings:
+
+- `ZWOP_WORKERS`: number of Uvicorn worker processes, if unset Uvicorn falls back to
+  `WEB_CONCURRENCY` and then a single worker. Ignored when reloading in debug mode.
+- `ZWOP_THREAD_LIMIT`: size of the AnyIO threadpool used for sync handlers and
+  dependencies, defaults to 100 (AnyIO default is 40).
+"""
+
+
 def create_app():
     from contextlib import asynccontextmanager
 
     import fastapi
+    import httpx
     from fastapi.middleware.gzip import GZipMiddleware
+    from fastapi.responses import ORJSONResponse
     from starlette.middleware.sessions import SessionMiddleware
 
+    from . import _fastapi_patches
+
+    _fastapi_patches.configure()
+
     from . import routers, services
     from ._logging import RequestLoggingMiddleware
     from .settings import configure as configure_settings
@@ -13,10 +30,20 @@ def create_app():
 
     @asynccontextmanager
     async def lifespan(app: fastapi.FastAPI):
+        import anyio.to_thread
+
         from . import _logging, mymdc
 
         _logging.configure(debug=app.debug, add_call_site_parameters=True)
 
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        limiter.total_tokens = settings.thread_limit
+
+        app.state.http_client = httpx.AsyncClient(
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        )
+
         await services.configure(settings, app)
 
         mymdc.configure(settings, app)
@@ -29,10 +56,13 @@ def create_app():
 
         yield
 
+        await app.state.http_client.aclose()
+
     app = fastapi.FastAPI(
         title="Zulip Write Only Proxy",
         lifespan=lifespan,
         debug=settings.debug,
+        default_response_class=ORJSONResponse,
         exception_handlers={
             routers.frontend.AuthException: routers.frontend.auth_redirect,
         },
@@ -46,6 +76,11 @@ def create_app():
     app.add_middleware(RequestLoggingMiddleware)
     app.add_middleware(GZipMiddleware, minimum_size=1000)
 
+    if settings.profile:
+        from ._profiling import ProfilingMiddleware
+
+        app.add_middleware(ProfilingMiddleware)
+
     return app
 
 
@@ -119,4 +154,5 @@ if __name__ == "__main__":  # pragma: no cover
         root_path=settings.proxy_root,
         forwarded_allow_ips=trusted_hosts,
         factory=True,
+        workers=settings.workers,
     )
@@ -1,10 +1,16 @@
-from .client import ScopedClient, ScopedClientCreate, ScopedClientWithToken
-from .zulip import BotConfig, Message, Messages, PropagateMode
+from .client import (
+    ClientView,
+    ScopedClient,
+    ScopedClientCreate,
+    ScopedClientWithToken,
+)
+from .zulip import BotConfig, Message, MessagesResponse, PropagateMode
 
 __all__ = [
     "BotConfig",
+    "ClientView",
     "Message",
-    "Messages",
+    "MessagesResponse",
     "PropagateMode",
     "ScopedClient",
     "ScopedClientCreate",
@@ -1,7 +1,7 @@
 import datetime
 import operator
 import secrets
-from typing import IO, TYPE_CHECKING, Any
+from typing import TYPE_CHECKING
 
 from pydantic import (
     BaseModel,
@@ -15,10 +15,10 @@ from pydantic import (
 from .. import logger
 from ..exceptions import ZwopException
 from .base import Base
-from .zulip import PropagateMode
+from .zulip import MessagesResponse, PropagateMode
 
 if TYPE_CHECKING:  # pragma: no cover
-    import zulip
+    from ..zulip_client import FileStream, ZulipClient
 
 
 class NoBotForClientError(ZwopException):
@@ -59,7 +59,7 @@ class ScopedClient(Base):
     # created_at - from base
     created_by: str
 
-    _client: "zulip.Client" = PrivateAttr()
+    _client: "ZulipClient" = PrivateAttr()
 
     @property
     def _key(self):
@@ -74,14 +74,15 @@ class ScopedClient(Base):
 
         return f"{self.bot_site.host}/{self.bot_id}"
 
-    def upload_file(self, file: IO[Any]):
-        return self._client.upload_file(file)
+    async def upload_file(self, file: "FileStream"):
+        """Upload `file`, given as a `(filename, chunks, content_type)` tuple."""
+        return await self._client.upload_file(file)
 
-    def get_stream_topics(self):
+    async def get_stream_topics(self):
         if self.stream is None:
             raise NoStreamForClientError
 
-        stream = self._client.get_stream_id(self.stream)
+        stream = await self._client.get_stream_id(self.stream)
         if stream["result"] != "success":
             logger.error(
                 "Failed to get stream id",
@@ -90,9 +91,9 @@ class ScopedClient(Base):
             )
             return stream
         stream_id = stream["stream_id"]
-        return self._client.get_stream_topics(stream_id)
+        return await self._client.get_stream_topics(stream_id)
 
-    def send_message(self, topic: str, content: str):
+    async def send_message(self, topic: str, content: str):
         request = {
             "type": "stream",
             "to": self.stream,
@@ -100,9 +101,9 @@ class ScopedClient(Base):
             "content": content,
         }
 
-        return self._client.send_message(request)
+        return await self._client.send_message(request)
 
-    def update_message(
+    async def update_message(
         self,
         topic: str | None,
         content: str | None,
@@ -120,9 +121,9 @@ class ScopedClient(Base):
         if content:
             request["content"] = content
 
-        return self._client.update_message(request)
+        return await self._client.update_message(request)
 
-    def get_messages(self):
+    async def get_messages(self) -> MessagesResponse:
         request = {
             "anchor": "newest",
             "num_before": 100,
@@ -135,14 +136,26 @@ class ScopedClient(Base):
         }
         # result should be success, if found oldest and found newest both true no more
         # messages to fetch. TODO: handle multi-page results for more than 100 messages
-        messages = self._client.get_messages(request)
-        messages["messages"] = sorted(
-            messages["messages"], key=operator.itemgetter("id"), reverse=True
-        )
+        messages = await self._client.get_messages(request)
+        if messages.result != "success":
+            logger.warning("Failed to get messages", client=self, response=messages)
+        messages.messages.sort(key=operator.attrgetter("id"), reverse=True)
         return messages
 
-    def get_me(self):
-        return self._client.get_profile()
+    async def get_me(self):
+        return await self._client.get_profile()
+
+
+class ClientView(BaseModel):
+    """Public view of a `ScopedClient`, without the token."""
+
+    created_at: datetime.datetime
+    proposal_no: int
+    proposal_id: int
+    stream: str | None
+    bot_id: int | None
+    bot_site: HttpUrl | None
+    created_by: str
 
 
 class ScopedClientWithToken(ScopedClient):
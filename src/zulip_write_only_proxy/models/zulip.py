@@ -1,11 +1,21 @@
 import enum
+import re
 from datetime import datetime
-from typing import Annotated
+from typing import Annotated, Self
+from urllib.parse import urlsplit
 
-from pydantic import BaseModel, EmailStr, Field, HttpUrl, SecretStr
+from pydantic import AliasChoices, BaseModel, Field, SecretStr
 
+from ..exceptions import ZwopException
 from .base import Base
 
+_EMAIL_RE = re.compile(r"[^@]+@[^@]+\.[^@]+")
+
+
+class InvalidBotConfigError(ZwopException):
+    def __init__(self, detail: str):
+        super().__init__(status_code=422, detail=detail)
+
 
 class PropagateMode(enum.StrEnum):
     change_one = "change_one"
@@ -14,32 +24,58 @@ class PropagateMode(enum.StrEnum):
 
 
 class BotConfig(Base):
-    email: EmailStr
+    # Plain strings as configs are loaded from the trusted repository on every start,
+    # new configs are validated once by `create` instead
+    email: str
     key: SecretStr
-    site: Annotated[HttpUrl, Field(default="https://mylog.connect.xfel.eu/")]
+    site: Annotated[str, Field(default="https://mylog.connect.xfel.eu/")]
     id: int
     proposal_no: int
 
     # created at is optional for bots, not that important/used
     created_at: datetime | None = None  # type: ignore[assignment]
 
+    @staticmethod
+    def check(email: str, site: str) -> None:
+        """Raise `InvalidBotConfigError` if the email or site is invalid, should be
+        called before using them to make any requests."""
+        if not _EMAIL_RE.fullmatch(email):
+            msg = f"Invalid bot email '{email}'"
+            raise InvalidBotConfigError(msg)
+
+        url = urlsplit(site)
+        if url.scheme not in {"http", "https"} or not url.hostname:
+            msg = f"Invalid bot site '{site}'"
+            raise InvalidBotConfigError(msg)
+
+    @classmethod
+    def create(cls, **data) -> Self:
+        """Create a new bot config, validating the email and site."""
+        bot = cls(**data)
+        cls.check(bot.email, bot.site)
+        return bot
+
     @property
     def _key(self):
-        return f"{self.site.host}/{self.id}"
+        return f"{urlsplit(self.site).hostname}/{self.id}"
 
 
 MessageID = int
 
 
 class Message(BaseModel):
-    topic: str
+    # Zulip API responses still use the legacy `subject` name
+    topic: Annotated[str, Field(validation_alias=AliasChoices("topic", "subject"))]
     id: MessageID
     content: str
     timestamp: datetime
 
 
-class Messages(BaseModel):
-    found_newest: bool
-    found_oldest: bool
-    messages: list[Message]
-    client: str
+class MessagesResponse(BaseModel):
+    """Response from Zulip `GET /messages`, validated directly from the JSON bytes."""
+
+    result: str
+    msg: str = ""
+    found_newest: bool = False
+    found_oldest: bool = False
+    messages: list[Message] = Field(default_factory=list)
@@ -1,11 +1,17 @@
 import asyncio
+import contextlib
+import fcntl
+import os
+import tempfile
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Generic, TypeVar
+from stat import S_IMODE
+from typing import Any, Generic, TypeVar
 
 import orjson
 import pydantic
 from anyio import Path as APath
+from anyio import to_thread
 
 from . import exceptions, logger
 from .models.base import Base
@@ -27,6 +33,10 @@ class BaseRepository(Generic[T]):
     data: dict[str, T] = field(default_factory=dict, init=False, repr=False)
 
     _data: list[T] = field(default_factory=list, init=False, repr=False)
+    _indexes: dict[str, dict[Any, T]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _stat: tuple[int, int, int] | None = field(default=None, init=False, repr=False)
 
     @staticmethod
     def _serialize_pydantic(obj):
@@ -38,27 +48,112 @@ class BaseRepository(Generic[T]):
             return obj.model_dump()
         raise TypeError
 
+    async def _file_stat(self) -> tuple[int, int, int] | None:
+        """Inode, modification time, and size of the file. Writes replace the file,
+        so the inode changes even if two writes happen within the mtime resolution."""
+        try:
+            stat = await APath(self.file).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
     async def load(self):
         async with self.lock:
-            if not await APath(self.file).exists():
-                return
+            await self._load()
+
+    async def _load(self):
+        if not await APath(self.file).exists():
+            return
+
+        stat = await self._file_stat()
+
+        self._set_data([
+            self.model.model_validate(item)
+            for item in orjson.loads(await APath(self.file).read_bytes())
+        ])
+        self._stat = stat
+
+    def _set_data(self, data: list[T]):
+        self._data = data
+        self.data = {item._key: item for item in self._data}
+        self._indexes.clear()
+
+    async def _changed(self) -> bool:
+        stat = await self._file_stat()
+        return stat is not None and stat != self._stat
+
+    async def _refresh(self):
+        """Reload the data if the file was modified since it was last read, e.g. by
+        another worker process. A single `stat` call when nothing changed."""
+        if await self._changed():
+            logger.info("Repository file changed, reloading", file=self.file)
+            await self.load()
+
+    @contextlib.asynccontextmanager
+    async def _file_lock(self):
+        """Exclusive lock on a sibling lock file, shared by all processes using the
+        repository file. Released when the file descriptor is closed."""
+        lock_file = self.file.with_name(f".{self.file.name}.lock")
+        fd = await to_thread.run_sync(os.open, lock_file, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            await to_thread.run_sync(fcntl.flock, fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    @contextlib.asynccontextmanager
+    async def _transaction(self):
+        """Serialise read-modify-write of the file across tasks and processes.
+
+        Changes written by other processes are loaded before modifying the data, which
+        is written out on exit. If anything fails the in-memory data is rolled back.
+        """
+        async with self.lock, self._file_lock():
+            if await self._changed():
+                logger.info("Repository file changed, reloading", file=self.file)
+                await self._load()
+
+            data = self._data.copy()
+            try:
+                yield
+                await self._write()
+            except BaseException:
+                self._set_data(data)
+                raise
 
-            self._data = [
-                self.model.model_validate(item)
-                for item in orjson.loads(await APath(self.file).read_bytes())
-            ]
+    async def write(self):
+        async with self.lock, self._file_lock():
+            await self._write()
+
+    async def _write(self):
+        content = orjson.dumps(
+            self._data,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS,
+            default=self._serialize_pydantic,
+        )
+        await to_thread.run_sync(self._replace_file, content)
 
-            self.data = {item._key: item for item in self._data}
+        self._stat = await self._file_stat()
 
-    async def write(self):
-        async with self.lock:
-            await APath(self.file).write_bytes(
-                orjson.dumps(
-                    self._data,
-                    option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS,
-                    default=self._serialize_pydantic,
-                )
-            )
+    def _replace_file(self, content: bytes):
+        """Write to a unique temporary file and replace, so that readers never see a
+        partially written file. The file holds secrets, so the temporary file is
+        created as `0600` and then given the mode of the file it replaces."""
+        fd, name = tempfile.mkstemp(
+            dir=self.file.parent, prefix=f".{self.file.name}.", suffix=".tmp"
+        )
+        tmp = Path(name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+
+            with contextlib.suppress(FileNotFoundError):
+                tmp.chmod(S_IMODE(self.file.stat().st_mode))
+
+            tmp.replace(self.file)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
 
     def _get_key_value(self, item, by):
         k = getattr(item, by, None)
@@ -67,12 +162,19 @@ class BaseRepository(Generic[T]):
         return k
 
     def _get_by(self, by, key):
-        return next(
-            (item for item in self._data if self._get_key_value(item, by) == key),
-            None,
-        )
+        index = self._indexes.get(by)
+
+        if index is None:
+            # Built from the end so that the first matching item takes precedence
+            index = self._indexes[by] = {
+                self._get_key_value(item, by): item for item in reversed(self._data)
+            }
+
+        return index.get(key)
 
     async def get(self, key: str | int, by: str | None = None) -> T | None:
+        await self._refresh()
+
         res = self._get_by(by, key) if by else self.data.get(str(key))
 
         if res is None:
@@ -81,29 +183,31 @@ class BaseRepository(Generic[T]):
         return res
 
     async def delete(self, key: str, by: str | None = None) -> str:
-        item = self._get_by(by, key) if by else self.data.get(key)
+        async with self._transaction():
+            item = self._get_by(by, key) if by else self.data.get(key)
 
-        if item is None:
-            raise KeyError(by or "key", key)
+            if item is None:
+                raise KeyError(by or "key", key)
 
-        _key = item._key
+            _key = item._key
 
-        self._data.remove(item)
-        del self.data[_key]
-
-        await self.write()
+            self._data.remove(item)
+            del self.data[_key]
+            self._indexes.clear()
 
         return _key
 
     async def insert(self, item: T):
-        if item._key in self.data:
-            logger.warning("Client already exists", key=item._key)
-            raise EntryExistsException(key=item._key)
-
-        self._data.append(item)
-        self.data[item._key] = self._data[-1]
+        async with self._transaction():
+            if item._key in self.data:
+                logger.warning("Client already exists", key=item._key)
+                raise EntryExistsException(key=item._key)
 
-        await self.write()
+            self._data.append(item)
+            self.data[item._key] = self._data[-1]
+            self._indexes.clear()
 
     async def list(self) -> list[T]:
+        await self._refresh()
+
         return self._data
@@ -1,41 +1,140 @@
-from typing import TYPE_CHECKING, Annotated
+import asyncio
+import hashlib
+from typing import TYPE_CHECKING, Annotated, Any
 
 import fastapi
+import orjson
+from fastapi.routing import APIRoute
 from fastapi.security import APIKeyHeader
+from pydantic_core import Url
 
 from zulip_write_only_proxy import mymdc
 
 from .. import __version__, __version_tuple__, logger, models, services
 
 if TYPE_CHECKING:  # pragma: no cover
-    from tempfile import SpooledTemporaryFile
+    from collections.abc import Callable, Coroutine
+
+    from fastapi.dependencies.models import Dependant
+
+    from ..settings import Settings
+
+    _Lookup = Callable[[], Coroutine[Any, Any, None]]
 
 _docs_url = "https://zulip.com/api/send-message#response"
 
 router = fastapi.APIRouter(prefix="/api")
 
+# Only used to document the scheme in the OpenAPI schema, `get_api_key` reads the
+# header directly to skip the security dependency machinery on every request
 api_key_header = APIKeyHeader(name="X-API-key", auto_error=False)
 
 
+def configure(_: "Settings", app: fastapi.FastAPI) -> None:
+    """Add the API key security scheme to the OpenAPI schema for all routes which
+    depend on `get_api_key`."""
+
+    def _requires_api_key(dependant: "Dependant") -> bool:
+        return any(
+            d.call is get_api_key or _requires_api_key(d)
+            for d in dependant.dependencies
+        )
+
+    def openapi():
+        if app.openapi_schema:
+            return app.openapi_schema
+
+        schema = fastapi.FastAPI.openapi(app)
+
+        scheme_name = api_key_header.scheme_name
+        schema.setdefault("components", {}).setdefault("securitySchemes", {})[
+            scheme_name
+        ] = api_key_header.model.model_dump(
+            mode="json", by_alias=True, exclude_none=True
+        )
+
+        for route in app.routes:
+            if not isinstance(route, APIRoute) or not route.include_in_schema:
+                continue
+
+            if not _requires_api_key(route.dependant):
+                continue
+
+            for method in route.methods:
+                operation = schema["paths"][route.path_format][method.lower()]
+                operation["security"] = [{scheme_name: []}]
+
+        return schema
+
+    app.openapi = openapi  # type: ignore[method-assign]
+
+
+# Async so that FastAPI runs it on the event loop instead of the threadpool
+async def get_api_key(request: fastapi.Request) -> str:  # noqa: RUF029
+    key = request.headers.get(api_key_header.model.name)
+
+    if not key:
+        raise fastapi.HTTPException(status_code=403, detail="Not authenticated")
+
+    return key
+
+
 async def get_client(
-    key: Annotated[str, fastapi.Security(api_key_header)],
+    request: fastapi.Request,
+    key: Annotated[str, fastapi.Depends(get_api_key)],
 ) -> models.ScopedClient:
-    return await services.get_client(key)
+    client = await services.get_client(key, http_client=request.app.state.http_client)
+
+    # Routers using this as a router-level dependency read the client from here
+    request.state.client = client
+
+    return client
+
+
+async def _run_lookups(lookups: "list[_Lookup]") -> None:
+    """Await the lookups, overlapping their round trips if there are several.
+
+    A task group is only entered for more than one lookup, as it adds overhead to every
+    request. It cancels the other lookups if one fails, so none outlive the request.
+    """
+    if len(lookups) <= 1:
+        for lookup in lookups:
+            await lookup()
+        return
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            for lookup in lookups:
+                tg.create_task(lookup())
+    except ExceptionGroup as e:
+        # Re-raise the original error (e.g. an `HTTPException`) instead of the group
+        raise e.exceptions[0] from None
 
 
 async def get_client_zulip(
+    request: fastapi.Request,
     client: Annotated[models.ScopedClient, fastapi.Depends(get_client)],
 ) -> models.ScopedClient:
-    if client.bot_id is None or client.bot_site is None:
+    async def _set_bot():
         logger.warning("Client missing bot", client=client)
-        bot = await services.get_or_create_bot(client.proposal_no)
+        bot = await services.get_or_create_bot(
+            client.proposal_no, http_client=request.app.state.http_client
+        )
         if bot:
             client.bot_id = bot.id
-            client.bot_site = bot.site
+            client.bot_site = Url(bot.site)
 
-    if client.stream is None:
+    async def _set_stream():
         client.stream = await mymdc.CLIENT.get_zulip_stream_name(client.proposal_no)
 
+    lookups: list[_Lookup] = []
+    if client.bot_id is None or client.bot_site is None:
+        lookups.append(_set_bot)
+    if client.stream is None:
+        lookups.append(_set_stream)
+
+    await _run_lookups(lookups)
+
     if client.bot_id is None or client.bot_site is None:
         raise fastapi.HTTPException(
             status_code=404,
@@ -56,40 +155,54 @@ async def get_client_zulip(
     return client
 
 
-@router.post(
+async def _stream(file: fastapi.UploadFile, chunk_size: int = 64 * 1024):
+    """Read an upload in chunks, so it is never held in memory in full."""
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
+# Authentication is a router-level dependency, resolved once per request, and
+# handlers read the resolved client from `request.state.client`
+_client_router = fastapi.APIRouter(dependencies=[fastapi.Depends(get_client)])
+
+_zulip_router = fastapi.APIRouter(
+    dependencies=[fastapi.Depends(get_client_zulip)], tags=["zulip"]
+)
+
+
+@_zulip_router.post(
     "/send_message",
     response_description=f"See <a href='{_docs_url}'>{_docs_url}</a>",
-    tags=["zulip"],
 )
-def send_message(
-    client: Annotated[models.ScopedClient, fastapi.Depends(get_client_zulip)],
+async def send_message(
+    request: fastapi.Request,
     topic: Annotated[str, fastapi.Query(...)],
     content: Annotated[str, fastapi.Body(...)],
     image: Annotated[fastapi.UploadFile | None, fastapi.File()] = None,
 ):
-    if image:
-        # Some screwing around to get the spooled tmp file to act more like a real file
-        # since Zulip needs it to have a filename
-        f: SpooledTemporaryFile = image.file  # type: ignore[assignment]
-        f._file.name = image.filename  # type: ignore[misc, assignment]
+    client: models.ScopedClient = request.state.client
 
-        result = client.upload_file(f)
+    if image:
+        result = await client.upload_file((
+            image.filename,
+            _stream(image),
+            image.content_type,
+        ))
 
         content += f"\n\n[]({result["uri"]})"
 
-    return client.send_message(topic, content)
+    return await client.send_message(topic, content)
 
 
 _docs_url = "https://zulip.com/api/update-message#response"
 
 
-@router.patch(
+@_zulip_router.patch(
     "/update_message",
     response_description=f"See <a href='{_docs_url}'>{_docs_url}</a>",
-    tags=["zulip"],
 )
-def update_message(
-    client: Annotated[models.ScopedClient, fastapi.Depends(get_client_zulip)],
+async def update_message(
+    request: fastapi.Request,
     message_id: Annotated[int, fastapi.Query(...)],
     propagate_mode: Annotated[models.PropagateMode | None, fastapi.Query()] = None,
     content: Annotated[str | None, fastapi.Body(media_type="text/plain")] = None,
@@ -103,62 +216,93 @@ def update_message(
                 "must be provided"
             ),
         )
-    return client.update_message(topic, content, message_id, propagate_mode)
+
+    client: models.ScopedClient = request.state.client
+
+    return await client.update_message(topic, content, message_id, propagate_mode)
 
 
 _docs_url = "https://zulip.com/api/upload-file#response"
 
 
-@router.post(
+@_zulip_router.post(
     "/upload_file",
     response_description=f"See <a href='{_docs_url}'>{_docs_url}</a>",
-    tags=["zulip"],
 )
-def upload_file(
-    client: Annotated[models.ScopedClient, fastapi.Depends(get_client_zulip)],
+async def upload_file(
+    request: fastapi.Request,
     file: Annotated[fastapi.UploadFile, fastapi.File(...)],
 ):
-    f: SpooledTemporaryFile = file.file  # type: ignore[assignment]
-    f._file.name = file.filename  # type: ignore[misc, assignment]
+    client: models.ScopedClient = request.state.client
 
-    return client.upload_file(f)
+    return await client.upload_file((file.filename, _stream(file), file.content_type))
 
 
 _docs_url = "https://zulip.com/api/get-stream-topics#response"
 
 
-@router.get(
+@_zulip_router.get(
     "/get_stream_topics",
     response_description=f"See <a href='{_docs_url}'>{_docs_url}</a>",
-    tags=["zulip"],
 )
-def get_stream_topics(
-    client: Annotated[models.ScopedClient, fastapi.Depends(get_client_zulip)],
-):
-    return client.get_stream_topics()
+async def get_stream_topics(request: fastapi.Request):
+    """Supports conditional requests: responses carry an `ETag` of the topics, and a
+    request with a matching `If-None-Match` header gets an empty `304` response."""
+    client: models.ScopedClient = request.state.client
 
+    topics = await client.get_stream_topics()
 
-@router.get("/me", response_model_exclude={"key"})
-def get_me(
-    client: Annotated[models.ScopedClient, fastapi.Depends(get_client)],
-) -> models.ScopedClient:
-    return client
+    if topics.get("result") != "success":
+        return topics
+
+    content = orjson.dumps(topics)
+    etag = f'"{hashlib.blake2b(content, digest_size=8).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=30"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return fastapi.Response(status_code=304, headers=headers)
+
+    return fastapi.Response(
+        content=content, media_type="application/json", headers=headers
+    )
+
+
+@_client_router.get("/me")
+async def get_me(request: fastapi.Request) -> models.ClientView:
+    return models.ClientView.model_validate(request.state.client, from_attributes=True)
 
 
 @router.post("/write_tokens")
-def write_tokens(
+async def write_tokens(
     res: Annotated[bool, fastapi.Depends(services.write_tokens)],
 ):
     return res
 
 
+# Health check response is constant apart from `root_path`, so serialise it once with
+# the closing brace stripped and append `root_path` per request
+_HEALTH_PREFIX = orjson.dumps({
+    "status": "OK",
+    "dirty": "dirty" in __version__,
+    "dev": "+" in __version__,
+    "version": __version__,
+    "version_tuple": __version_tuple__,
+})[:-1]
+
+
 @router.get("/health")
-def healthcheck(request: fastapi.Request):
-    return {
-        "status": "OK",
-        "dirty": "dirty" in __version__,
-        "dev": "+" in __version__,
-        "version": __version__,
-        "version_tuple": __version_tuple__,
-        "root_path": request.scope.get("root_path"),
-    }
+async def healthcheck(request: fastapi.Request):
+    return fastapi.Response(
+        content=(
+            _HEALTH_PREFIX
+            + b',"root_path":'
+            + orjson.dumps(request.scope.get("root_path"))
+            + b"}"
+        ),
+        media_type="application/json",
+    )
+
+
+router.include_router(_client_router)
+router.include_router(_zulip_router)
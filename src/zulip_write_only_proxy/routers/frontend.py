@@ -182,19 +182,12 @@ async def client_messages(request: Request):
             status_code=400,
             detail="Bad Request - missing X-API-Key header",
         )
-    client = await services.get_client(client_key)
+    client = await services.get_client(
+        client_key, http_client=request.app.state.http_client
+    )
 
     if request.headers.get("HX-Current-URL", "").endswith("/client/messages"):
-        _messages = client.get_messages()
-        if messages := [
-            models.Message(
-                topic=m["subject"],
-                id=m["id"],
-                content=m["content"],
-                timestamp=m["timestamp"],
-            )
-            for m in _messages["messages"]
-        ]:
+        if messages := (await client.get_messages()).messages:
             return TEMPLATES.TemplateResponse(
                 "fragments/list-messages-rows.html",
                 {"request": request, "messages": messages},
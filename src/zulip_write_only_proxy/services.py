@@ -6,12 +6,12 @@ from pathlib import Path
 from typing import TYPE_CHECKING, Annotated, Any, Literal
 
 import fastapi
+import httpx
 import orjson
-import zulip
 from pydantic import SecretStr
 from pydantic_core import Url
 
-from . import _remote_receive, logger, models, mymdc, repositories
+from . import _remote_receive, logger, models, mymdc, repositories, zulip_client
 from .models.client import NoBotForClientError
 from .settings import Settings, settings
 
@@ -41,8 +41,8 @@ async def configure(settings: Settings, _: fastapi.FastAPI | None):
         "Setting up repositories", client_repo=CLIENT_REPO, zuliprc_repo=ZULIPRC_REPO
     )
 
-    await CLIENT_REPO.load()
-    await ZULIPRC_REPO.load()
+    # File I/O is already offloaded to threads by `anyio.Path`, load both together
+    await asyncio.gather(CLIENT_REPO.load(), ZULIPRC_REPO.load())
 
 
 async def get_or_create_bot(
@@ -51,6 +51,7 @@ async def get_or_create_bot(
     bot_key: str | None = None,
     bot_site: str = "https://mylog.connect.xfel.eu/",
     bot_id: int | None = None,
+    http_client: httpx.AsyncClient | None = None,
 ) -> models.BotConfig:
     created_at = None
 
@@ -71,10 +72,18 @@ async def get_or_create_bot(
             ),
         )
 
+    models.BotConfig.check(bot_email, bot_site)
+
     if not bot_id:
-        profile = zulip.Client(
-            email=bot_email, api_key=bot_key, site=bot_site
-        ).get_profile()
+        async with contextlib.AsyncExitStack() as stack:
+            if http_client is None:
+                # Not called within a request, use a client just for this lookup
+                http_client = await stack.enter_async_context(httpx.AsyncClient())
+
+            client = zulip_client.ZulipClient(
+                email=bot_email, api_key=bot_key, site=bot_site, http_client=http_client
+            )
+            profile = await client.get_profile()
         bot_id = profile.get("user_id")
         created_at = profile.get("date_joined")
 
@@ -86,11 +95,11 @@ async def get_or_create_bot(
             ),
         )
 
-    bot = models.BotConfig(
+    bot = models.BotConfig.create(
         id=bot_id,
         key=SecretStr(bot_key),
         email=bot_email,
-        site=Url(bot_site),
+        site=bot_site,
         created_at=created_at or datetime.datetime.now(tz=datetime.UTC),
         proposal_no=proposal_no,
     )
@@ -133,7 +142,7 @@ async def create_client(
         proposal_id=await mymdc.CLIENT.get_proposal_id(new_client.proposal_no),
         stream=new_client.stream,
         bot_id=bot.id if bot else None,
-        bot_site=bot.site if bot else None,
+        bot_site=Url(bot.site) if bot else None,
         token=new_client.token,
         created_at=new_client.created_at,
         created_by=created_by,
@@ -150,10 +159,7 @@ async def delete_client(key: str) -> str:
     return await CLIENT_REPO.delete(key, by="token")
 
 
-async def get_client(key: str | None) -> models.ScopedClient:
-    if key is None:
-        raise fastapi.HTTPException(status_code=403, detail="Not authenticated")
-
+async def get_client(key: str, http_client: httpx.AsyncClient) -> models.ScopedClient:
     client = await CLIENT_REPO.get(key, by="token")
 
     if client is None:
@@ -170,10 +176,11 @@ async def get_client(key: str | None) -> models.ScopedClient:
                 detail=f"Bot configuration not found for {client._bot_key}",
             )
 
-        client._client = zulip.Client(
+        client._client = zulip_client.ZulipClient(
             email=bot.email,
             api_key=bot.key.get_secret_value(),
-            site=str(bot.site),
+            site=bot.site,
+            http_client=http_client,
         )
     except NoBotForClientError as e:
         logger.warning("No bot for client", client=client, error=e)
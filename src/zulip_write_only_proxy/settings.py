@@ -60,6 +60,9 @@ class Settings(BaseSettings):
     debug: bool = True
     address: AnyUrl = AnyUrl("http://127.0.0.1:8000")
     log_level: str = "debug"
+    profile: bool = False
+    workers: int | None = None
+    thread_limit: int = 100
     proxy_root: str = ""
     session_secret: SecretStr
     config_dir: DirectoryPath = Path(__file__).parent.parent.parent / "config"
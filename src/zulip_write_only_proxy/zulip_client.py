@@ -0,0 +1,149 @@
+"""Async Zulip Client
+
+Minimal HTTPX based replacement for the parts of the synchronous `zulip.Client` used
+by the proxy, so that requests to Zulip do not block the event loop. Method names and
+return values mirror the `zulip` package: each returns the decoded JSON response, with
+errors reported via the `result` field instead of being raised. Responses which are
+not JSON give an `http-error` result, and failed requests a `connection-error` one.
+`get_messages` validates the response body straight into models, with errors reported
+the same way via `MessagesResponse.result`."""
+
+import re
+import secrets
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import Any
+
+import httpx
+import orjson
+
+from .models import MessagesResponse
+
+# (filename, content chunks, content type) of a file to upload
+FileStream = tuple[str | None, AsyncIterable[bytes], str | None]
+
+# Same escaping as HTTPX uses for multipart form parameters, following the HTML5 spec
+_FORM_PARAM_RE = re.compile(r'["\\\x00-\x1a\x1c-\x1f]')
+
+
+class ZulipClient:
+    def __init__(
+        self,
+        email: str,
+        api_key: str,
+        site: str,
+        http_client: httpx.AsyncClient,
+    ) -> None:
+        """Client for the Zulip API, authenticated as a bot.
+
+        Requests are made with `http_client`, which should be the application-wide
+        client so that connections are pooled across bots. It is not closed by this
+        client, as it outlives it.
+        """
+        self._auth = httpx.BasicAuth(email, api_key)
+        self._base_url = f"{site.rstrip("/")}/api/v1/"
+        self._http_client = http_client
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        return await self._http_client.request(
+            method, self._base_url + path, auth=self._auth, **kwargs
+        )
+
+    async def _call(self, method: str, path: str, **kwargs) -> dict[str, Any]:
+        try:
+            res = await self._request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            return _connection_error(e)
+
+        try:
+            return res.json()
+        except ValueError:
+            return _http_error(res)
+
+    async def get_profile(self) -> dict[str, Any]:
+        return await self._call("GET", "users/me")
+
+    async def get_stream_id(self, stream: str) -> dict[str, Any]:
+        return await self._call("GET", "get_stream_id", params={"stream": stream})
+
+    async def get_stream_topics(self, stream_id: int) -> dict[str, Any]:
+        return await self._call("GET", f"users/me/{stream_id}/topics")
+
+    async def send_message(self, request: dict[str, Any]) -> dict[str, Any]:
+        return await self._call("POST", "messages", data=request)
+
+    async def update_message(self, request: dict[str, Any]) -> dict[str, Any]:
+        request = request.copy()
+        message_id = request.pop("message_id")
+        return await self._call("PATCH", f"messages/{message_id}", data=request)
+
+    async def upload_file(self, file: FileStream) -> dict[str, Any]:
+        """Upload a file, streaming the multipart body as the chunks arrive so only a
+        single chunk is held in memory, instead of requiring a sync file object like
+        HTTPX's `files=`.
+
+        As the length of the body is not known up front it is sent with chunked
+        transfer encoding, without a `Content-Length` header."""
+        boundary = secrets.token_hex(16)
+
+        return await self._call(
+            "POST",
+            "user_uploads",
+            content=_multipart_stream(boundary, *file),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+
+    async def get_messages(self, request: dict[str, Any]) -> MessagesResponse:
+        params = {
+            k: v if isinstance(v, str) else orjson.dumps(v).decode()
+            for k, v in request.items()
+        }
+        try:
+            res = await self._request("GET", "messages", params=params)
+        except httpx.HTTPError as e:
+            return MessagesResponse.model_validate(_connection_error(e))
+
+        try:
+            return MessagesResponse.model_validate_json(res.content)
+        except ValueError:
+            # Also covers `ValidationError`, for JSON bodies which are not a response
+            return MessagesResponse.model_validate(_http_error(res))
+
+
+def _connection_error(e: httpx.HTTPError) -> dict[str, Any]:
+    return {"result": "connection-error", "msg": f"Connection error: {e!r}"}
+
+
+def _http_error(res: httpx.Response) -> dict[str, Any]:
+    return {
+        "result": "http-error",
+        "msg": "Unexpected error from the server",
+        "status_code": res.status_code,
+    }
+
+
+def _escape_form_param(match: re.Match[str]) -> str:
+    char = match.group(0)
+    return "\\\\" if char == "\\" else f"%{ord(char):02X}"
+
+
+async def _multipart_stream(
+    boundary: str,
+    filename: str | None,
+    chunks: AsyncIterable[bytes],
+    content_type: str | None,
+) -> AsyncIterator[bytes]:
+    disposition = 'form-data; name="file"'
+    if filename:
+        escaped = _FORM_PARAM_RE.sub(_escape_form_param, filename)
+        disposition += f'; filename="{escaped}"'
+
+    yield (
+        f"--{boundary}\r\n"
+        f"Content-Disposition: {disposition}\r\n"
+        f"Content-Type: {content_type or "application/octet-stream"}\r\n\r\n"
+    ).encode()
+
+    async for chunk in chunks:
+        yield chunk
+
+    yield f"\r\n--{boundary}--\r\n".encode()
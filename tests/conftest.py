@@ -3,6 +3,7 @@ import os
 from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
@@ -53,7 +54,9 @@ ZWOP_AUTH__CLIENT_SECRET=client_secret
 
 @pytest.fixture(scope="session", autouse=True)
 def zulip_client():
-    with patch("zulip.Client", new_callable=MagicMock) as mock_class:
+    with patch(
+        "zulip_write_only_proxy.zulip_client.ZulipClient", new_callable=MagicMock
+    ) as mock_class:
         mock_class.return_value = mock_class
         yield mock_class
 
@@ -79,7 +82,7 @@ def a_zuliprc():
     return BotConfig(
         email="foo@bar.com",
         key=SecretStr("secret"),
-        site=Url("http://a-site.com"),
+        site="http://a-site.com",
         id=1,
         proposal_no=1234,
         created_at=datetime.fromisoformat("2021-01-01Z00:00:00"),
@@ -111,6 +114,12 @@ def zuliprc_repo(_services):
     return services.ZULIPRC_REPO
 
 
+@pytest_asyncio.fixture
+async def http_client():
+    async with httpx.AsyncClient() as client:
+        yield client
+
+
 @pytest.fixture(scope="session", autouse=True)
 def mymdc_client():
     with patch(
@@ -1,14 +1,15 @@
+import asyncio
 import io
-from typing import TYPE_CHECKING
-from unittest.mock import MagicMock
+from typing import Annotated
+from unittest.mock import AsyncMock, patch
 
-if TYPE_CHECKING:
-    from fastapi.testclient import TestClient
+import fastapi
+from fastapi.testclient import TestClient
 
 
 def test_send_message(fastapi_client: "TestClient", zulip_client):
     zulip_response = {"id": 42, "msg": "", "result": "success"}
-    zulip_client.send_message = MagicMock(return_value=zulip_response)
+    zulip_client.send_message = AsyncMock(return_value=zulip_response)
 
     response = fastapi_client.post(
         "/api/send_message",
@@ -41,6 +42,82 @@ def test_send_message_unauthorised(fastapi_client):
     assert response.json() == {"detail": "Unauthorised"}
 
 
+def test_send_message_no_key(fastapi_client):
+    response = fastapi_client.post(
+        "/api/send_message",
+        headers={"X-API-key": ""},
+        params={"topic": "Test Topic"},
+        data={"content": "Test Content"},
+    )
+
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Not authenticated"}
+
+
+def test_openapi_security(fastapi_client):
+    schema = fastapi_client.get("/openapi.json").json()
+
+    assert schema["components"]["securitySchemes"]["APIKeyHeader"] == {
+        "type": "apiKey",
+        "in": "header",
+        "name": "X-API-key",
+    }
+    assert schema["paths"]["/api/me"]["get"]["security"] == [{"APIKeyHeader": []}]
+    assert "security" not in schema["paths"]["/api/health"]["get"]
+
+
+def test_send_message_no_lookups(fastapi_client, zulip_client):
+    zulip_client.send_message = AsyncMock(return_value={"result": "success"})
+
+    # Client already has a bot and stream, so no task group is needed
+    with patch("asyncio.TaskGroup", side_effect=AssertionError) as task_group:
+        response = fastapi_client.post(
+            "/api/send_message",
+            params={"topic": "Test Topic"},
+            data={"content": "Test Content"},
+        )
+
+    assert response.status_code == 200
+    task_group.assert_not_called()
+
+
+def test_send_message_bot_lookup_fails(a_scoped_client, fastapi_client, mymdc_client):
+    client = a_scoped_client.model_copy(update={"bot_id": None, "stream": None})
+
+    stream_lookup_cancelled = False
+
+    async def get_zulip_stream_name(_):
+        nonlocal stream_lookup_cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            stream_lookup_cancelled = True
+            raise
+
+    with (
+        patch(
+            "zulip_write_only_proxy.services.get_client",
+            AsyncMock(return_value=client),
+        ),
+        patch(
+            "zulip_write_only_proxy.services.get_or_create_bot",
+            AsyncMock(side_effect=fastapi.HTTPException(status_code=422)),
+        ),
+        patch.object(
+            mymdc_client, "get_zulip_stream_name", side_effect=get_zulip_stream_name
+        ),
+    ):
+        response = fastapi_client.post(
+            "/api/send_message",
+            params={"topic": "Test Topic"},
+            data={"content": "Test Content"},
+        )
+
+    assert response.status_code == 422
+    assert stream_lookup_cancelled
+    assert client.stream is None
+
+
 def test_send_message_with_image(fastapi_client, zulip_client):
     zulip_response_msg = {"id": 42, "msg": "", "result": "success"}
     zulip_response_file = {
@@ -49,8 +126,8 @@ def test_send_message_with_image(fastapi_client, zulip_client):
         "uri": "/user_uploads/1/4e/m2A3MSqFnWRLUf9SaPzQ0Up_/zulip.txt",
     }
 
-    zulip_client.send_message = MagicMock(return_value=zulip_response_msg)
-    zulip_client.upload_file = MagicMock(return_value=zulip_response_file)
+    zulip_client.send_message = AsyncMock(return_value=zulip_response_msg)
+    zulip_client.upload_file = AsyncMock(return_value=zulip_response_file)
 
     image = io.BytesIO(b"test image data")
     response = fastapi_client.post(
@@ -72,15 +149,15 @@ def test_send_message_with_image(fastapi_client, zulip_client):
     }
     zulip_client.send_message.assert_called_once_with(zulip_request_msg)
 
-    # Call is made with spooled temp file object
+    # Call is made with a (filename, chunks, content type) tuple
     zulip_client.upload_file.assert_called_once()
-    uploaded_image = zulip_client.upload_file.call_args.args[0]
-    assert uploaded_image.name == "test.jpg"
+    filename, _, _ = zulip_client.upload_file.call_args.args[0]
+    assert filename == "test.jpg"
 
 
 def test_update_message_move_topic(fastapi_client: "TestClient", zulip_client):
     zulip_response = {"msg": "", "result": "success"}
-    zulip_client.update_message = MagicMock(return_value=zulip_response)
+    zulip_client.update_message = AsyncMock(return_value=zulip_response)
 
     response = fastapi_client.patch(
         "/api/update_message",
@@ -101,7 +178,7 @@ def test_update_message_move_topic(fastapi_client: "TestClient", zulip_client):
 
 def test_update_message_content(fastapi_client: "TestClient", zulip_client):
     zulip_response = {"msg": "", "result": "success"}
-    zulip_client.update_message = MagicMock(return_value=zulip_response)
+    zulip_client.update_message = AsyncMock(return_value=zulip_response)
 
     response = fastapi_client.patch(
         "/api/update_message",
@@ -144,7 +221,7 @@ def test_upload_file(fastapi_client, zulip_client):
         "result": "success",
         "uri": "/user_uploads/1/4e/m2A3MSqFnWRLUf9SaPzQ0Up_/zulip.txt",
     }
-    zulip_client.upload_file = MagicMock(return_value=zulip_response_file)
+    zulip_client.upload_file = AsyncMock(return_value=zulip_response_file)
 
     file = io.BytesIO(b"test file data")
     response = fastapi_client.post(
@@ -155,10 +232,10 @@ def test_upload_file(fastapi_client, zulip_client):
     assert response.status_code == 200
     assert response.json() == zulip_response_file
 
-    # Call is made with spooled temp file object
+    # Call is made with a (filename, chunks, content type) tuple
     zulip_client.upload_file.assert_called_once()
-    uploaded_file = zulip_client.upload_file.call_args.args[0]
-    assert uploaded_file.name == "test.jpg"
+    filename, _, _ = zulip_client.upload_file.call_args.args[0]
+    assert filename == "test.jpg"
 
 
 def test_get_stream_topics(fastapi_client, zulip_client):
@@ -172,18 +249,49 @@ def test_get_stream_topics(fastapi_client, zulip_client):
             {"max_id": 6, "name": "Denmark2"},
         ],
     }
-    zulip_client.get_stream_id = MagicMock(return_value=zulip_response_id)
-    zulip_client.get_stream_topics = MagicMock(return_value=zulip_response_topics)
+    zulip_client.get_stream_id = AsyncMock(return_value=zulip_response_id)
+    zulip_client.get_stream_topics = AsyncMock(return_value=zulip_response_topics)
 
     response = fastapi_client.get("/api/get_stream_topics")
 
     assert response.status_code == 200
     assert response.json() == zulip_response_topics
+    assert "ETag" in response.headers
+
+
+def test_get_stream_topics_not_modified(fastapi_client, zulip_client):
+    zulip_response_id = {"msg": "", "result": "success", "stream_id": 15}
+    zulip_response_topics = {
+        "msg": "",
+        "result": "success",
+        "topics": [{"max_id": 26, "name": "Denmark3"}],
+    }
+    zulip_client.get_stream_id = AsyncMock(return_value=zulip_response_id)
+    zulip_client.get_stream_topics = AsyncMock(return_value=zulip_response_topics)
+
+    etag = fastapi_client.get("/api/get_stream_topics").headers["ETag"]
+
+    response = fastapi_client.get(
+        "/api/get_stream_topics", headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    zulip_response_topics["topics"].append({"max_id": 27, "name": "Denmark4"})
+
+    response = fastapi_client.get(
+        "/api/get_stream_topics", headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
 
 
 def test_get_stream_topics_error(fastapi_client, zulip_client):
     zulip_response_id = {"result": "error"}
-    zulip_client.get_stream_id = MagicMock(return_value=zulip_response_id)
+    zulip_client.get_stream_id = AsyncMock(return_value=zulip_response_id)
 
     response = fastapi_client.get("/api/get_stream_topics")
 
@@ -239,4 +347,91 @@ def test_get_me(a_scoped_client, fastapi_client, zulip_client):
     )
 
     assert response.status_code == 200
-    assert response.content.decode() == a_scoped_client.model_dump_json()
+    assert response.content.decode() == a_scoped_client.model_dump_json(
+        exclude={"token"}
+    )
+
+
+def test_healthcheck(fastapi_client):
+    from zulip_write_only_proxy import __version__
+
+    response = fastapi_client.get("/api/health")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["status"] == "OK"
+    assert response.json()["version"] == __version__
+    assert response.json()["root_path"] == ""
+
+
+def _patched_app(calls: dict[str, int]):
+    def leaf():
+        calls["leaf"] += 1
+        return "leaf"
+
+    def shared(
+        background_tasks: fastapi.BackgroundTasks,
+        value: Annotated[str, fastapi.Depends(leaf, use_cache=False)],
+    ):
+        calls["shared"] += 1
+        background_tasks.add_task(calls.__setitem__, "background", 1)
+        return f"shared-{value}"
+
+    def first(value: Annotated[str, fastapi.Depends(shared)]):
+        return f"first-{value}"
+
+    def second(value: Annotated[str, fastapi.Depends(shared)]):
+        return f"second-{value}"
+
+    app = fastapi.FastAPI()
+
+    @app.get("/")
+    def index(
+        a: Annotated[str, fastapi.Depends(first)],
+        b: Annotated[str, fastapi.Depends(second)],
+    ):
+        return [a, b]
+
+    return app, shared
+
+
+def test_fastapi_patches_applied():
+    from fastapi.dependencies import utils
+
+    from zulip_write_only_proxy import _fastapi_patches
+
+    _fastapi_patches.configure()
+
+    def call(): ...
+
+    assert utils.get_typed_signature(call) is utils.get_typed_signature(call)
+
+    if _fastapi_patches._version() < (0, 111):
+        assert utils.solve_dependencies.__name__ == "solve_dependencies"
+        assert hasattr(utils.solve_dependencies, "__wrapped__")
+
+
+def test_fastapi_patches_cached_sub_dependency():
+    calls = {"leaf": 0, "shared": 0, "background": 0}
+
+    app, _ = _patched_app(calls)
+
+    with TestClient(app) as client:
+        response = client.get("/")
+
+    assert response.status_code == 200
+    assert response.json() == ["first-shared-leaf", "second-shared-leaf"]
+    # Second use of `shared` is read from the cache without re-solving `leaf`
+    assert calls == {"leaf": 1, "shared": 1, "background": 1}
+
+
+def test_fastapi_patches_dependency_overrides():
+    calls = {"leaf": 0, "shared": 0, "background": 0}
+    app, shared = _patched_app(calls)
+    app.dependency_overrides[shared] = lambda: "override"
+
+    with TestClient(app) as client:
+        response = client.get("/")
+
+    assert response.json() == ["first-override", "second-override"]
+    assert calls == {"leaf": 0, "shared": 0, "background": 0}
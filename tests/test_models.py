@@ -1,51 +1,60 @@
-import io
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock
 
+import pytest
 from structlog.testing import capture_logs
 
+from zulip_write_only_proxy.models import BotConfig, MessagesResponse
+from zulip_write_only_proxy.models.zulip import InvalidBotConfigError
 
-def test_upload_file(a_scoped_client):
-    a_scoped_client._client.upload_file = MagicMock(
+
+@pytest.mark.asyncio
+async def test_upload_file(a_scoped_client):
+    a_scoped_client._client.upload_file = AsyncMock(
         return_value={"uri": "/foo/bar.jpg"}
     )
 
-    file = io.BytesIO(b"test file data")
+    async def chunks():  # noqa: RUF029
+        yield b"test file data"
+
+    file = ("test.txt", chunks(), "text/plain")
 
-    result = a_scoped_client.upload_file(file)
+    result = await a_scoped_client.upload_file(file)
 
-    a_scoped_client._client.upload_file.assert_called_once_with(file)
+    a_scoped_client._client.upload_file.assert_awaited_once_with(file)
 
     assert result == {"uri": "/foo/bar.jpg"}
 
 
-def test_get_stream_topics(a_scoped_client):
-    a_scoped_client._client.get_stream_id = MagicMock(
+@pytest.mark.asyncio
+async def test_get_stream_topics(a_scoped_client):
+    a_scoped_client._client.get_stream_id = AsyncMock(
         return_value={"result": "success", "stream_id": 123}
     )
-    a_scoped_client._client.get_stream_topics = MagicMock(
+    a_scoped_client._client.get_stream_topics = AsyncMock(
         return_value=["Topic 1", "Topic 2"]
     )
 
-    result = a_scoped_client.get_stream_topics()
+    result = await a_scoped_client.get_stream_topics()
 
-    a_scoped_client._client.get_stream_id.assert_called_once_with("Test Stream")
+    a_scoped_client._client.get_stream_id.assert_awaited_once_with("Test Stream")
 
-    a_scoped_client._client.get_stream_topics.assert_called_once_with(123)
+    a_scoped_client._client.get_stream_topics.assert_awaited_once_with(123)
 
     assert result == ["Topic 1", "Topic 2"]
 
 
-def test_get_stream_topics_log(a_scoped_client):
+@pytest.mark.asyncio
+async def test_get_stream_topics_log(a_scoped_client):
     response = {
         "code": "BAD_REQUEST",
         "msg": "Invalid stream name 'nonexistent'",
         "result": "error",
     }
 
-    a_scoped_client._client.get_stream_id = MagicMock(return_value=response)
+    a_scoped_client._client.get_stream_id = AsyncMock(return_value=response)
 
     with capture_logs() as caplog:
-        a_scoped_client.get_stream_topics()
+        await a_scoped_client.get_stream_topics()
 
     assert len(caplog) == 1
     assert caplog[0]["stream"] == "Test Stream"
@@ -53,12 +62,13 @@ def test_get_stream_topics_log(a_scoped_client):
     assert caplog[0]["event"] == "Failed to get stream id"
 
 
-def test_send_message(a_scoped_client):
-    a_scoped_client._client.send_message = MagicMock(return_value={"result": "success"})
+@pytest.mark.asyncio
+async def test_send_message(a_scoped_client):
+    a_scoped_client._client.send_message = AsyncMock(return_value={"result": "success"})
 
-    result = a_scoped_client.send_message("Test Topic", "Test Content")
+    result = await a_scoped_client.send_message("Test Topic", "Test Content")
 
-    a_scoped_client._client.send_message.assert_called_once_with({
+    a_scoped_client._client.send_message.assert_awaited_once_with({
         "type": "stream",
         "to": "Test Stream",
         "topic": "Test Topic",
@@ -66,3 +76,41 @@ def test_send_message(a_scoped_client):
     })
 
     assert result == {"result": "success"}
+
+
+@pytest.mark.asyncio
+async def test_get_messages(a_scoped_client):
+    response = MessagesResponse.model_validate_json(
+        b"""{
+            "result": "success",
+            "msg": "",
+            "found_newest": true,
+            "found_oldest": true,
+            "messages": [
+                {"id": 1, "subject": "Topic 1", "content": "a", "timestamp": 0},
+                {"id": 2, "subject": "Topic 2", "content": "b", "timestamp": 60}
+            ]
+        }"""
+    )
+    a_scoped_client._client.get_messages = AsyncMock(return_value=response)
+
+    result = await a_scoped_client.get_messages()
+
+    assert [m.id for m in result.messages] == [2, 1]
+    assert result.messages[0].topic == "Topic 2"
+
+
+def test_bot_config_create(a_zuliprc):
+    bot = BotConfig.create(**a_zuliprc.model_dump())
+
+    assert bot == a_zuliprc
+    assert bot._key == "a-site.com/1"
+
+
+@pytest.mark.parametrize(
+    ("email", "site"),
+    [("not-an-email", "http://a-site.com"), ("foo@bar.com", "ftp://a-site.com")],
+)
+def test_bot_config_create_invalid(a_zuliprc, email, site):
+    with pytest.raises(InvalidBotConfigError):
+        BotConfig.create(**(a_zuliprc.model_dump() | {"email": email, "site": site}))
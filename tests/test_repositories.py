@@ -1,6 +1,8 @@
+import asyncio
 import tempfile
 from datetime import datetime
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 from pydantic import SecretStr
@@ -70,3 +72,82 @@ async def test_insert_delete_scoped_client(client_repo):
 
     result = await client_repo.get(client._key)
     assert result is None
+
+
+@pytest.mark.asyncio
+async def test_reload_on_external_write(a_scoped_client):
+    with tempfile.TemporaryDirectory() as f:
+        path = Path(f) / "test.json"
+
+        repo = BaseRepository(file=path, model=ScopedClient)
+        await repo.write()
+
+        assert await repo.get(a_scoped_client._key) is None
+
+        # e.g. another worker process inserting a client
+        other = BaseRepository(file=path, model=ScopedClient)
+        await other.load()
+        await other.insert(a_scoped_client)
+
+        result = await repo.get(a_scoped_client.token.get_secret_value(), by="token")
+
+        assert isinstance(result, ScopedClient)
+        assert result.model_dump() == a_scoped_client.model_dump()
+
+
+@pytest.mark.asyncio
+async def test_write_keeps_file_mode(a_scoped_client):
+    with tempfile.TemporaryDirectory() as f:
+        path = Path(f) / "test.json"
+        path.write_text("[]")
+        path.chmod(0o600)
+
+        repo = BaseRepository(file=path, model=ScopedClient)
+        await repo.load()
+        await repo.insert(a_scoped_client)
+
+        assert path.stat().st_mode & 0o777 == 0o600
+
+
+@pytest.mark.asyncio
+async def test_insert_rolled_back_on_failed_write(a_scoped_client):
+    with tempfile.TemporaryDirectory() as f:
+        path = Path(f) / "test.json"
+
+        repo = BaseRepository(file=path, model=ScopedClient)
+        await repo.write()
+
+        with (
+            patch.object(repo, "_replace_file", side_effect=OSError("disk full")),
+            pytest.raises(OSError, match="disk full"),
+        ):
+            await repo.insert(a_scoped_client)
+
+        assert await repo.get(a_scoped_client._key) is None
+        assert await repo.list() == []
+        assert list(Path(f).glob("*.tmp")) == []
+
+
+@pytest.mark.asyncio
+async def test_concurrent_inserts_from_other_worker(a_scoped_client):
+    with tempfile.TemporaryDirectory() as f:
+        path = Path(f) / "test.json"
+
+        # e.g. two worker processes inserting clients into the same file
+        repos = [BaseRepository(file=path, model=ScopedClient) for _ in range(2)]
+
+        clients = [
+            a_scoped_client.model_copy(
+                update={"proposal_no": i, "token": SecretStr(f"token-{i}")}
+            )
+            for i in range(20)
+        ]
+
+        await asyncio.gather(
+            *(repos[i % 2].insert(client) for i, client in enumerate(clients))
+        )
+
+        repo = BaseRepository(file=path, model=ScopedClient)
+        await repo.load()
+
+        assert {c._key for c in await repo.list()} == {c._key for c in clients}
@@ -9,6 +9,7 @@ from pydantic import SecretStr
 
 from zulip_write_only_proxy import services
 from zulip_write_only_proxy.models import ScopedClient, ScopedClientCreate
+from zulip_write_only_proxy.models.zulip import InvalidBotConfigError
 from zulip_write_only_proxy.mymdc import MyMdCResponseError
 
 
@@ -54,11 +55,49 @@ async def test_create_client_no_bot():
 
 
 @pytest.mark.asyncio
-async def test_get_client(a_scoped_client):
-    result = await services.get_client(a_scoped_client.token.get_secret_value())
+async def test_get_client(a_scoped_client, http_client):
+    result = await services.get_client(
+        a_scoped_client.token.get_secret_value(), http_client
+    )
 
     assert isinstance(result, ScopedClient)
     assert a_scoped_client.model_dump_json() == result.model_dump_json()
 
     with pytest.raises(HTTPException):
-        await services.get_client("invalid")
+        await services.get_client("invalid", http_client)
+
+
+@pytest.mark.asyncio
+async def test_get_client_deleted_by_other_worker(a_scoped_client, http_client):
+    from zulip_write_only_proxy.repositories import BaseRepository
+
+    client = a_scoped_client.model_copy(
+        update={"proposal_no": 4321, "token": SecretStr("deleted-elsewhere")}
+    )
+    await services.CLIENT_REPO.insert(client)
+
+    assert await services.get_client("deleted-elsewhere", http_client)
+
+    # e.g. another worker process deleting the client
+    other = BaseRepository(file=services.CLIENT_REPO.file, model=ScopedClient)
+    await other.load()
+    await other.delete("deleted-elsewhere", by="token")
+
+    with pytest.raises(HTTPException):
+        await services.get_client("deleted-elsewhere", http_client)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("email", "site"),
+    [("not-an-email", "https://a-site.com"), ("bot@a-site.com", "ftp://a-site.com")],
+)
+async def test_get_or_create_bot_invalid_config(email, site, zulip_client):
+    zulip_client.get_profile = AsyncMock()
+
+    with pytest.raises(InvalidBotConfigError):
+        await services.get_or_create_bot(
+            4321, bot_email=email, bot_key="key", bot_site=site
+        )
+
+    zulip_client.get_profile.assert_not_called()
@@ -0,0 +1,98 @@
+import httpx
+import pytest
+
+from zulip_write_only_proxy.zulip_client import ZulipClient
+
+
+@pytest.mark.asyncio
+async def test_upload_file_streams_multipart():
+    requests: list[tuple[httpx.Request, bytes]] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request, await request.aread()))
+        return httpx.Response(200, json={"result": "success", "uri": "/foo.txt"})
+
+    async def chunks():  # noqa: RUF029
+        yield b"test "
+        yield b"file data"
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        client = ZulipClient("bot@a-site.com", "key", "http://a-site.com/", http)
+
+        result = await client.upload_file(("test.txt", chunks(), "text/plain"))
+
+    assert result == {"result": "success", "uri": "/foo.txt"}
+
+    request, body = requests[0]
+    assert request.url == "http://a-site.com/api/v1/user_uploads"
+
+    content_type = request.headers["Content-Type"]
+    assert content_type.startswith("multipart/form-data; boundary=")
+    boundary = content_type.removeprefix("multipart/form-data; boundary=")
+
+    assert (
+        body
+        == (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="file"; filename="test.txt"\r\n'
+            "Content-Type: text/plain\r\n\r\n"
+            "test file data"
+            f"\r\n--{boundary}--\r\n"
+        ).encode()
+    )
+
+
+@pytest.mark.asyncio
+async def test_upload_file_escapes_filename():
+    bodies: list[bytes] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(await request.aread())
+        return httpx.Response(200, json={"result": "success", "uri": "/foo.txt"})
+
+    async def chunks():  # noqa: RUF029
+        yield b"data"
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        client = ZulipClient("bot@a-site.com", "key", "http://a-site.com/", http)
+
+        await client.upload_file(('a"b\\c\r\n--BND.txt', chunks(), None))
+
+    assert b'filename="a%22b\\\\c%0D%0A--BND.txt"\r\n' in bodies[0]
+    assert b"\r\n--BND" not in bodies[0]
+
+
+@pytest.mark.asyncio
+async def test_non_json_response():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(502, text="<html>Bad Gateway</html>")
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        client = ZulipClient("bot@a-site.com", "key", "http://a-site.com/", http)
+
+        result = await client.get_profile()
+        messages = await client.get_messages({"anchor": "newest"})
+
+    assert result == {
+        "result": "http-error",
+        "msg": "Unexpected error from the server",
+        "status_code": 502,
+    }
+    assert messages.result == "http-error"
+    assert messages.messages == []
+
+
+@pytest.mark.asyncio
+async def test_connection_error():
+    def handler(request: httpx.Request) -> httpx.Response:
+        msg = "Connection refused"
+        raise httpx.ConnectError(msg, request=request)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        client = ZulipClient("bot@a-site.com", "key", "http://a-site.com/", http)
+
+        result = await client.get_profile()
+        messages = await client.get_messages({"anchor": "newest"})
+
+    assert result["result"] == "connection-error"
+    assert messages.result == "connection-error"